@@ -1,19 +1,22 @@
 import sys
 import os
+import json
 import threading
+import time
+import bisect
 from datetime import datetime
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout,
     QPushButton, QComboBox, QTextEdit, QLabel, QLineEdit, QFontComboBox, 
     QSpinBox, QColorDialog, QFrame, QCompleter, QCheckBox
 )
-from PyQt6.QtCore import pyqtSignal, QObject, Qt, QStringListModel
+from PyQt6.QtCore import pyqtSignal, QObject, Qt, QStringListModel, QRunnable, QThreadPool
 
 # Adjust the path to import from the 'main' subdirectory
 sys.path.append(os.path.join(os.path.dirname(__file__), 'main'))
-from transcription_engine import TranscriptionEngine
+from transcription_engine import TranscriptionEngine, VoskGrammarGenerator
 from data_engine import DataEngine
-from core_logic import CoreLogic
+from core_logic import CoreLogic, VerseHit
 
 # --- Configuration ---
 VOSK_MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'vosk-model')
@@ -92,24 +95,118 @@ class SelectAllLineEdit(QLineEdit):
         super().focusInEvent(event)
         self.selectAll()
 
+class IndexedCompleter(QCompleter):
+    """
+    A QCompleter that filters through a precomputed index instead of having
+    Qt scan every row on each keystroke. Subclasses define set_items(items)
+    and matches(prefix), which returns the strings to offer.
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._model = QStringListModel(self)
+        self.setModel(self._model)
+        self.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+
+    def splitPath(self, path):
+        # Called on every keystroke: load only the matching rows, then let the
+        # empty path match all of them.
+        self._model.setStringList(self.matches(path))
+        return [""]
+
+class BookCompleter(IndexedCompleter):
+    """Matches book names containing the typed text via a substring index."""
+    def __init__(self, books, parent=None):
+        super().__init__(parent)
+        self.set_items(books)
+
+    def set_items(self, books):
+        self._books = list(books)
+        self._index = {}
+        for book in self._books:
+            name = book.lower()
+            for start in range(len(name)):
+                for end in range(start + 1, len(name) + 1):
+                    matches = self._index.setdefault(name[start:end], [])
+                    if not matches or matches[-1] != book:
+                        matches.append(book)
+
+    def matches(self, prefix):
+        if not prefix:
+            return self._books
+        return self._index.get(prefix.lower(), [])
+
+class NumberCompleter(IndexedCompleter):
+    """Matches chapter/verse numbers starting with the typed digits via bisect."""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._numbers = []
+
+    def set_items(self, numbers):
+        # Ints, as the DataEngine getters return them; formatted only when matched
+        self._numbers = sorted(numbers)
+
+    def matches(self, prefix):
+        if not prefix:
+            return [str(n) for n in self._numbers]
+        if not prefix.isdigit() or prefix.startswith('0') or not self._numbers:
+            return []
+        # Numbers starting with e.g. "1" are the ranges [1, 2), [10, 20), [100, 200)...
+        low, high = int(prefix), int(prefix) + 1
+        result = []
+        while low <= self._numbers[-1]:
+            first = bisect.bisect_left(self._numbers, low)
+            last = bisect.bisect_left(self._numbers, high, first)
+            result.extend(str(n) for n in self._numbers[first:last])
+            low, high = low * 10, high * 10
+        return result
+
 class WorkerSignals(QObject):
     update_transcript = pyqtSignal(str, bool)
     update_status = pyqtSignal(str)
+    verse_parsed = pyqtSignal(int, object)
+
+class ParseTask(QRunnable):
+    """Parses a final transcript and looks up its verse off the UI thread."""
+    def __init__(self, core_logic, text, translation, seq, signals):
+        super().__init__()
+        self.core_logic = core_logic
+        self.text = text
+        self.translation = translation
+        self.seq = seq
+        self.signals = signals
+
+    def run(self):
+        verse_data = self.core_logic.parse_and_find_verse(self.text, self.translation)
+        if verse_data:
+            self.signals.verse_parsed.emit(self.seq, verse_data)
 
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("AutoVerse Control Panel")
         self.resize(1200, 700)
-        self.setStyleSheet(DARK_STYLESHEET)
 
         # --- Initialize Engines ---
         self.data_engine = DataEngine(DB_PATH)
-        self.data_engine.connect()
+        self.data_engine.setup_database()
         self.book_list = self.data_engine.get_all_book_names()
+        # Completer suggestions are served from memory; the whole table of
+        # chapter/verse numbers is small enough to load once.
+        self._chapters_by_book = self.data_engine.get_all_chapters_by_book()
+        self._verses_by_chapter = self.data_engine.get_all_verses_by_chapter()
         self.core_logic = CoreLogic(self.data_engine)
+        # The grammar never changes while the app runs, so it is built and
+        # serialized once instead of on every Start
+        self._grammar_json = json.dumps(self.core_logic.get_grammar(VoskGrammarGenerator.VOCABULARY))
         self.transcription_engine = TranscriptionEngine(VOSK_MODEL_PATH)
         self.signals = WorkerSignals()
+        self.pool = QThreadPool.globalInstance()
+        # Parse tasks can finish out of order; these drop stale results.
+        self._parse_seq = 0
+        self._shown_seq = 0
+        # Last partial result sent to the UI (see on_transcription_update)
+        self._last_partial = ''
+        self._last_partial_time = 0.0
 
         self.initUI()
         self.post_init_checks()
@@ -133,6 +230,10 @@ class MainWindow(QMainWindow):
         transcript_v_layout.addWidget(QLabel("PRIVATE TRANSCRIPT"))
         self.transcript_text = QTextEdit()
         self.transcript_text.setReadOnly(True)
+        # Keep appends cheap over long sessions: Qt drops the oldest lines past
+        # the cap, and a read-only view needs no undo history.
+        self.transcript_text.document().setMaximumBlockCount(500)
+        self.transcript_text.setUndoRedoEnabled(False)
         transcript_v_layout.addWidget(self.transcript_text)
         top_layout.addLayout(transcript_v_layout, 3)
 
@@ -168,6 +269,7 @@ class MainWindow(QMainWindow):
 
         self.signals.update_transcript.connect(self.update_transcript_display)
         self.signals.update_status.connect(self.update_status_bar)
+        self.signals.verse_parsed.connect(self.on_verse_parsed)
 
     def post_init_checks(self):
         """Checks to run after the UI is initialized."""
@@ -186,10 +288,7 @@ class MainWindow(QMainWindow):
         # --- Book Input ---
         grid.addWidget(QLabel("Book"), 0, 0)
         self.book_input = SelectAllLineEdit()
-        book_completer = QCompleter(self.book_list)
-        book_completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
-        book_completer.setFilterMode(Qt.MatchFlag.MatchContains)
-        self.book_input.setCompleter(book_completer)
+        self.book_input.setCompleter(BookCompleter(self.book_list, self))
         self.book_input.returnPressed.connect(self.on_book_entered)
         self.book_input.editingFinished.connect(self.update_chapter_suggestions)
         grid.addWidget(self.book_input, 0, 1)
@@ -197,10 +296,8 @@ class MainWindow(QMainWindow):
         # --- Chapter Input ---
         grid.addWidget(QLabel("Chapter"), 1, 0)
         self.chapter_input = SelectAllLineEdit()
-        self.chapter_completer_model = QStringListModel()
-        chapter_completer = QCompleter()
-        chapter_completer.setModel(self.chapter_completer_model)
-        self.chapter_input.setCompleter(chapter_completer)
+        self.chapter_completer = NumberCompleter(self)
+        self.chapter_input.setCompleter(self.chapter_completer)
         self.chapter_input.returnPressed.connect(self.on_chapter_entered)
         self.chapter_input.editingFinished.connect(self.update_verse_suggestions)
         grid.addWidget(self.chapter_input, 1, 1)
@@ -208,10 +305,8 @@ class MainWindow(QMainWindow):
         # --- Verse Input ---
         grid.addWidget(QLabel("Verse"), 2, 0)
         self.verse_input = SelectAllLineEdit()
-        self.verse_completer_model = QStringListModel()
-        verse_completer = QCompleter()
-        verse_completer.setModel(self.verse_completer_model)
-        self.verse_input.setCompleter(verse_completer)
+        self.verse_completer = NumberCompleter(self)
+        self.verse_input.setCompleter(self.verse_completer)
         self.verse_input.returnPressed.connect(self.manual_lookup)
         grid.addWidget(self.verse_input, 2, 1)
         
@@ -244,17 +339,19 @@ class MainWindow(QMainWindow):
     def update_chapter_suggestions(self):
         book = self.book_input.text()
         translation = self.translation_combo.currentText()
-        if book in self.book_list:
-            chapters = self.data_engine.get_chapters_for_book(translation, book)
-            self.chapter_completer_model.setStringList(chapters)
+        chapters = self._chapters_by_book.get((translation, book))
+        if chapters is not None:
+            self.chapter_completer.set_items(chapters)
 
     def update_verse_suggestions(self):
         book = self.book_input.text()
         chapter = self.chapter_input.text()
+        if not chapter.isdigit():
+            return
         translation = self.translation_combo.currentText()
-        if book in self.book_list and chapter.isdigit():
-            verses = self.data_engine.get_verses_for_chapter(translation, book, chapter)
-            self.verse_completer_model.setStringList(verses)
+        verses = self._verses_by_chapter.get((translation, book, int(chapter)))
+        if verses is not None:
+            self.verse_completer.set_items(verses)
 
     def create_customize_display_group(self):
         group_widget = QWidget()
@@ -293,8 +390,12 @@ class MainWindow(QMainWindow):
 
     def populate_audio_devices(self):
         self.audio_devices, default_device_index = self.transcription_engine.list_audio_devices()
-        for index, name in self.audio_devices.items():
-            self.audio_device_combo.addItem(name, userData=index)
+        # Add all names in one batch, then attach the device indices
+        self.audio_device_combo.blockSignals(True)
+        self.audio_device_combo.addItems(list(self.audio_devices.values()))
+        for row, index in enumerate(self.audio_devices):
+            self.audio_device_combo.setItemData(row, index)
+        self.audio_device_combo.blockSignals(False)
 
         if default_device_index != -1:
             # Find the combo box index corresponding to the default device index
@@ -316,13 +417,16 @@ class MainWindow(QMainWindow):
 
         verse_text = self.data_engine.get_verse(translation, book, chapter, verse)
         if verse_text:
-            verse_data = {
-                'translation': translation,
-                'book': book.title(),
-                'chapter': chapter,
-                'verse_num': verse,
-                'text': verse_text
-            }
+            verse_data = VerseHit(
+                translation=translation,
+                book=book.title(),
+                chapter=chapter,
+                verse_num=verse,
+                text=verse_text
+            )
+            # Results of parses still in flight, including the newest, are
+            # older than this lookup
+            self._shown_seq = self._parse_seq + 1
             self.display_verse(verse_data)
         else:
             self.preview_text.setText(f"Verse not found:\n{translation} {book} {chapter}:{verse}")
@@ -336,11 +440,16 @@ class MainWindow(QMainWindow):
             self.audio_device_combo.style().polish(self.audio_device_combo)
 
             selected_index = self.audio_device_combo.currentData()
-            should_record = self.record_audio_checkbox.isChecked()
+            record_path = None
+            if self.record_audio_checkbox.isChecked():
+                # The recording is encoded to this file while listening
+                timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+                record_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'recordings', f'recording_{timestamp}.mp3')
 
             self.transcription_thread = threading.Thread(
                 target=self.transcription_engine.start_listening,
-                args=(self.on_transcription_update, self.on_status_update, selected_index, should_record)
+                args=(self.on_transcription_update, self.on_status_update, selected_index, record_path),
+                kwargs={'grammar_json': self._grammar_json}
             )
             self.transcription_thread.daemon = True
             self.transcription_thread.start()
@@ -353,12 +462,18 @@ class MainWindow(QMainWindow):
 
             self.transcription_engine.stop_listening()
 
-            if self.record_audio_checkbox.isChecked():
-                timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-                output_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'recordings', f'recording_{timestamp}.mp3')
-                self.transcription_engine.save_audio_stream(output_path)
-
     def on_transcription_update(self, text, is_final):
+        # Called from the transcription thread for every audio block. Skip
+        # empty results, and repeated or too frequent (>10 Hz) partials, so
+        # they don't each cost a queued cross-thread call. Finals always go through.
+        if not text:
+            return
+        if not is_final:
+            now = time.monotonic()
+            if text == self._last_partial or now - self._last_partial_time < 0.1:
+                return
+            self._last_partial_time = now
+        self._last_partial = '' if is_final else text
         self.signals.update_transcript.emit(text, is_final)
 
     def on_status_update(self, message):
@@ -368,9 +483,15 @@ class MainWindow(QMainWindow):
         if is_final and text.strip():
             self.transcript_text.append(text)
             translation = self.translation_combo.currentText()
-            verse_data = self.core_logic.parse_and_find_verse(text, translation)
-            if verse_data:
-                self.display_verse(verse_data)
+            self._parse_seq += 1
+            self.pool.start(ParseTask(self.core_logic, text, translation, self._parse_seq, self.signals))
+
+    def on_verse_parsed(self, seq, verse_data):
+        """Displays a verse found by a ParseTask unless a newer one is already shown."""
+        if seq < self._shown_seq:
+            return
+        self._shown_seq = seq
+        self.display_verse(verse_data)
 
     def update_status_bar(self, message):
         """Updates the status bar with a message."""
@@ -381,7 +502,7 @@ class MainWindow(QMainWindow):
         """Updates the preview panel with the found verse."""
         formatted_text = self.core_logic.get_ui_text(verse_data)
         self.preview_text.setText(formatted_text)
-        self.update_status_bar(f"Displayed: {verse_data['book']} {verse_data['chapter']}:{verse_data['verse_num']}")
+        self.update_status_bar(f"Displayed: {verse_data.book} {verse_data.chapter}:{verse_data.verse_num}")
 
     def clear_displays(self):
         """Clears the transcript and preview displays."""
@@ -397,6 +518,8 @@ class MainWindow(QMainWindow):
 
 def main():
     app = QApplication(sys.argv)
+    # Applied once app-wide rather than re-cascaded from the window
+    app.setStyleSheet(DARK_STYLESHEET)
     window = MainWindow()
     window.show()
     sys.exit(app.exec())
@@ -1,26 +1,166 @@
 
 import re
+import functools
+from dataclasses import dataclass
+
+@dataclass(frozen=True, slots=True)
+class VerseHit:
+    """A found verse. Immutable, so worker threads can hand it to the UI as-is."""
+    translation: str
+    book: str
+    chapter: str
+    verse_num: str
+    text: str
+
+# Compiled once at import; this runs on every transcription update.
+# No chapter or verse number exceeds three digits (Psalm 119:176), so longer
+# numbers such as years are rejected here instead of costing a verse lookup.
+_CITATION_RE = re.compile(r"(?<!\S)(\d{1,3})\s+(\d{1,3})\b")
+# Most transcription updates hold no number at all; this rejects them cheaply.
+_HAS_DIGIT = re.compile(r"\d").search
+
+# Vosk English models spell numbers out, e.g. "john three sixteen"
+_UNITS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9
+}
+_TEENS = {
+    "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14,
+    "fifteen": 15, "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19
+}
+_TENS = {
+    "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50,
+    "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90
+}
+_NUMBER_WORDS = frozenset(_UNITS) | frozenset(_TEENS) | frozenset(_TENS) | {"hundred", "and"}
+_HAS_NUMBER_WORD = re.compile(
+    r"\b(?:" + "|".join(list(_UNITS) + list(_TEENS) + list(_TENS)) + r")\b", re.IGNORECASE
+).search
+
+
+def _read_number(words, i):
+    """
+    Reads one spoken number of up to three digits starting at words[i], e.g.
+    "sixteen", "twenty three" or "one hundred (and) nineteen". A number ends
+    where it could not continue, so "three sixteen" reads as 3, then 16.
+
+    :return: A (value, index after the number) tuple, or (None, i).
+    """
+    start, value = i, 0
+    if i + 1 < len(words) and words[i] in _UNITS and words[i + 1] == "hundred":
+        value = _UNITS[words[i]] * 100
+        i += 2
+        # "one hundred and nineteen", but not the "and" in "... hundred and john"
+        if (i + 1 < len(words) and words[i] == "and"
+                and (words[i + 1] in _UNITS or words[i + 1] in _TEENS or words[i + 1] in _TENS)):
+            i += 1
+    if i < len(words):
+        word = words[i]
+        if word in _TENS:
+            value += _TENS[word]
+            i += 1
+            if i < len(words) and words[i] in _UNITS:
+                value += _UNITS[words[i]]
+                i += 1
+        elif word in _TEENS:
+            value += _TEENS[word]
+            i += 1
+        elif word in _UNITS:
+            value += _UNITS[word]
+            i += 1
+    if i == start:
+        return None, start
+    return value, i
+
+
+def _spoken_numbers_to_digits(text):
+    """
+    Rewrites spelled-out numbers as digits, e.g. "john three sixteen" ->
+    "john 3 16". Ordinals such as "first" are left for the book names.
+    """
+    words = text.lower().split()
+    result = []
+    i = 0
+    while i < len(words):
+        value, end = _read_number(words, i)
+        if value is None:
+            result.append(words[i])
+            i += 1
+        else:
+            result.append(str(value))
+            i = end
+    return ' '.join(result)
+
+
+def _find_citation(text, books, max_words, max_len):
+    """
+    Finds the first "<book> <chapter> <verse>" citation in text.
+
+    Each "<chapter> <verse>" pair is found in one regex pass, then only a
+    window as long as the longest book name before it is checked against
+    `books`, longest name first. Kept free of instance state so the loop
+    only touches locals.
+
+    :return: A (lowercase book, chapter, verse) tuple or None.
+    """
+    for match in _CITATION_RE.finditer(text):
+        end = match.start()
+        start = max(0, end - max_len - 1)
+        words = text[start:end].lower().split()
+        if start and not text[start - 1].isspace() and not text[start].isspace():
+            words = words[1:]  # Drop the word cut in half by the window edge
+        for count in range(min(max_words, len(words)), 0, -1):
+            book = ' '.join(words[-count:])
+            if book in books:
+                return book, match.group(1), match.group(2)
+    return None
 
 class CoreLogic:
     """
     Parses transcription text to find and retrieve Bible verses.
     """
+    # Book tables keyed by the spoken word map they were built from, so
+    # further instances reuse them instead of rebuilding.
+    _book_table_cache = {}
+
     def __init__(self, data_engine):
         """
         Initializes the CoreLogic engine.
         :param data_engine: An instance of the DataEngine.
         """
         self.data_engine = data_engine
-        self.book_pattern = self._build_book_pattern()
+        self._spoken_map = data_engine.spoken_word_map
+        self._canonical_book, self._max_book_words, self._max_book_len = self._get_book_table()
+        # Vosk often re-emits the same phrase. Only the parse is memoized, per
+        # instance: verse text comes from the DataEngine, whose own cache never
+        # keeps a miss caused by a database error.
+        self._match_citation = functools.lru_cache(maxsize=256)(self._parse_citation)
 
-    def _build_book_pattern(self):
-        """Builds a regex pattern to match all known Bible books."""
-        # The keys from the spoken word map are perfect for this
-        books = list(self.data_engine.spoken_word_map.keys())
-        # Add books that might be spoken differently, e.g., with numbers
-        books.extend(['1 corinthians', '2 corinthians', '1 timothy', '2 timothy', '1 peter', '2 peter', '1 john', '2 john', '3 john'])
-        # Create a regex pattern: (first corinthians|genesis|...)
-        return f"({'|'.join(sorted(books, key=len, reverse=True))})"
+    def _get_book_table(self):
+        """Returns (canonical book map, max words, max length), cached per spoken word map."""
+        key = frozenset(self._spoken_map.items())
+        table = CoreLogic._book_table_cache.get(key)
+        if table is None:
+            books = self._build_canonical_book_map()
+            table = (
+                books,
+                max(len(book.split()) for book in books),
+                max(len(book) for book in books)
+            )
+            CoreLogic._book_table_cache[key] = table
+        return table
+
+    def _build_canonical_book_map(self):
+        """
+        Builds a map from every known lowercase book name to its canonical form,
+        e.g. 'first corinthians' and '1 corinthians' both map to '1 Corinthians'.
+        """
+        # The spoken word map already holds the spoken variations
+        books = dict(self._spoken_map)
+        # Add the canonical names themselves, e.g. books spoken with numbers
+        for canonical in self._spoken_map.values():
+            books.setdefault(canonical.lower(), canonical)
+        return books
 
     def parse_and_find_verse(self, text, translation='KJV'):
         """
@@ -28,41 +168,67 @@ class CoreLogic:
         
         :param text: The transcribed text from the STT engine.
         :param translation: The Bible translation to use (e.g., 'KJV').
-        :return: A dictionary with verse info or None.
+        :return: A VerseHit or None.
         """
-        text = text.lower()
-        
-        pattern = re.compile(f"{self.book_pattern}\s+(\d+)\s+(\d+)")
-        match = pattern.search(text)
+        if _HAS_NUMBER_WORD(text):
+            text = _spoken_numbers_to_digits(text)
+        if not _HAS_DIGIT(text):
+            return None
 
-        if not match:
+        citation = self._match_citation(text)
+        if not citation:
             return None
 
-        book, chapter, verse = match.groups()
-        
+        book, chapter, verse = citation
         verse_text = self.data_engine.get_verse(translation, book, chapter, verse)
-        
+
         if verse_text:
-            return {
-                'translation': translation,
-                'book': self.data_engine.spoken_word_map.get(book, book).title(),
-                'chapter': chapter,
-                'verse_num': verse,
-                'text': verse_text
-            }
-        
+            return VerseHit(
+                translation=translation,
+                book=book,
+                chapter=chapter,
+                verse_num=verse,
+                text=verse_text
+            )
+
         return None
 
+    def _parse_citation(self, text):
+        """
+        Finds the citation in text; memoized per instance as _match_citation.
+        :return: A (canonical book, chapter, verse) tuple or None.
+        """
+        citation = _find_citation(text, self._canonical_book, self._max_book_words, self._max_book_len)
+        if not citation:
+            return None
+        book, chapter, verse = citation
+        return self._canonical_book[book], chapter, verse
+
+    def get_grammar(self, vocabulary=()):
+        """
+        Builds a Vosk grammar restricted to citation-shaped speech.
+
+        :param vocabulary: Further words to allow, e.g. VoskGrammarGenerator.VOCABULARY.
+        :return: A list of `vocabulary`, every word of every known book name,
+                 the number words chapters and verses are spoken with, and the
+                 out-of-vocabulary token '[unk]'. Digit strings are left out:
+                 Vosk models spell numbers out, so it would drop them anyway.
+        """
+        words = set(vocabulary)
+        words.update(word for book in self._canonical_book for word in book.split())
+        words.update(_NUMBER_WORDS)
+        return sorted(word for word in words if not word.isdigit()) + ['[unk]']
+
     def get_ui_text(self, verse_data):
         """
         Formats the verse data into a string for UI display.
 
-        :param verse_data: A dictionary with verse info.
+        :param verse_data: A VerseHit.
         :return: A formatted string for the UI.
         """
         if not verse_data:
             return ""
-        return f'"...{verse_data["text"]}"\n\n{verse_data["book"]} {verse_data["chapter"]}:{verse_data["verse_num"]} ({verse_data["translation"]})'
+        return f'"...{verse_data.text}"\n\n{verse_data.book} {verse_data.chapter}:{verse_data.verse_num} ({verse_data.translation})'
 
 
 if __name__ == '__main__':
@@ -85,9 +251,9 @@ if __name__ == '__main__':
     test_phrase_1 = "Testing testing and now for a reading from john 3 16 and it says..."
     result = engine.parse_and_find_verse(test_phrase_1)
     assert result is not None
-    assert result['book'] == "John"
-    assert result['chapter'] == "3"
-    assert result['verse_num'] == "16"
+    assert result.book == "John"
+    assert result.chapter == "3"
+    assert result.verse_num == "16"
     print(f"Successfully parsed: '{test_phrase_1}'")
 
     # Test the new get_ui_text function
@@ -96,6 +262,20 @@ if __name__ == '__main__':
     assert ui_text == expected_text
     print(f"Successfully formatted UI text: '{ui_text}'")
 
+    # Vosk spells the numbers out
+    assert _spoken_numbers_to_digits("psalm one hundred and nineteen one hundred seventy six") == "psalm 119 176"
+    assert _spoken_numbers_to_digits("first john twenty three sixteen") == "first john 23 16"
+    test_phrase_3 = "a reading from john three sixteen"
+    result = engine.parse_and_find_verse(test_phrase_3)
+    assert result is not None
+    assert (result.book, result.chapter, result.verse_num) == ("John", "3", "16")
+    print(f"Successfully parsed: '{test_phrase_3}'")
+
+    grammar = engine.get_grammar(["galatians", "16"])
+    assert {"galatians", "john", "sixteen", "hundred"} <= set(grammar)
+    assert "16" not in grammar and grammar[-1] == "[unk]"
+    print("Successfully built grammar.")
+
     test_phrase_2 = "This is a test with no verse"
     result = engine.parse_and_find_verse(test_phrase_2)
     assert result is None
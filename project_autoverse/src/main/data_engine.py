@@ -1,25 +1,229 @@
 
 import sqlite3
 import os
+import re
+import queue
+import functools
+import threading
+import contextlib
+from types import MappingProxyType
+
+# Lookup queries, kept as constants so each connection's statement cache
+# prepares them once and reuses them on every call. Translations and books are
+# passed as integer ids; DataEngine maps names to ids in Python.
+SQL_GET_VERSE = """
+    SELECT text FROM scriptures
+    WHERE translation_id = ? AND book_id = ? AND chapter = ? AND verse_num = ?
+"""
+# Completed with one "?" per requested verse by get_verses_batch
+SQL_GET_VERSES_IN = """
+    SELECT verse_num, text FROM scriptures
+    WHERE translation_id = ? AND book_id = ? AND chapter = ? AND verse_num IN ({})
+"""
+# Ranked full-text search; bm25 (the FTS5 rank) puts the best match first
+SQL_SEARCH = """
+    SELECT t.name, b.name, s.chapter, s.verse_num
+    FROM scriptures_fts
+    JOIN scriptures AS s ON s.id = scriptures_fts.rowid
+    JOIN translations AS t ON t.id = s.translation_id
+    JOIN books AS b ON b.id = s.book_id
+    WHERE scriptures_fts MATCH ? ORDER BY rank LIMIT ?
+"""
+SQL_ALL_BOOKS = "SELECT name FROM books ORDER BY name"
+SQL_CHAPTERS_FOR_BOOK = """
+    SELECT DISTINCT chapter FROM scriptures
+    WHERE translation_id = ? AND book_id = ? ORDER BY chapter
+"""
+SQL_VERSES_FOR_CHAPTER = """
+    SELECT DISTINCT verse_num FROM scriptures
+    WHERE translation_id = ? AND book_id = ? AND chapter = ? ORDER BY verse_num
+"""
+SQL_ALL_CHAPTERS = """
+    SELECT DISTINCT translation_id, book_id, chapter FROM scriptures
+    ORDER BY translation_id, book_id, chapter
+"""
+SQL_ALL_VERSES = """
+    SELECT translation_id, book_id, chapter, verse_num FROM scriptures
+    ORDER BY translation_id, book_id, chapter, verse_num
+"""
+
+# Maps spoken variations of book names to their canonical form. A more robust
+# solution might use fuzzy matching or a more extensive list. Read-only and
+# built once at import, so every DataEngine (and thread) shares it.
+_SPOKEN_WORD_MAP = MappingProxyType({
+    "first corinthians": "1 Corinthians",
+    "second corinthians": "2 Corinthians",
+    "one corinthians": "1 Corinthians",
+    "two corinthians": "2 Corinthians",
+    "genesis": "Genesis",
+    "exodus": "Exodus",
+    "leviticus": "Leviticus",
+    "numbers": "Numbers",
+    "deuteronomy": "Deuteronomy",
+    "joshua": "Joshua",
+    "judges": "Judges",
+    "ruth": "Ruth",
+    "first samuel": "1 Samuel",
+    "second samuel": "2 Samuel",
+    "first kings": "1 Kings",
+    "second kings": "2 Kings",
+    "first chronicles": "1 Chronicles",
+    "second chronicles": "2 Chronicles",
+    "ezra": "Ezra",
+    "nehemiah": "Nehemiah",
+    "esther": "Esther",
+    "job": "Job",
+    "psalms": "Psalm",
+    "proverbs": "Proverbs",
+    "ecclesiastes": "Ecclesiastes",
+    "song of solomon": "Song of Solomon",
+    "isaiah": "Isaiah",
+    "jeremiah": "Jeremiah",
+    "lamentations": "Lamentations",
+    "ezekiel": "Ezekiel",
+    "daniel": "Daniel",
+    "hosea": "Hosea",
+    "joel": "Joel",
+    "amos": "Amos",
+    "obadiah": "Obadiah",
+    "jonah": "Jonah",
+    "micah": "Micah",
+    "nahum": "Nahum",
+    "habakkuk": "Habakkuk",
+    "zephaniah": "Zephaniah",
+    "haggai": "Haggai",
+    "zechariah": "Zechariah",
+    "malachi": "Malachi",
+    "matthew": "Matthew",
+    "mark": "Mark",
+    "luke": "Luke",
+    "john": "John",
+    "acts": "Acts",
+    "romans": "Romans",
+    "first timothy": "1 Timothy",
+    "second timothy": "2 Timothy",
+    "titus": "Titus",
+    "philemon": "Philemon",
+    "hebrews": "Hebrews",
+    "james": "James",
+    "first peter": "1 Peter",
+    "second peter": "2 Peter",
+    "first john": "1 John",
+    "second john": "2 John",
+    "third john": "3 John",
+    "jude": "Jude",
+    "revelation": "Revelation"
+})
+
+# Keeps scriptures_fts in step with scriptures. populate_db drops these for
+# bulk loads; setup_database recreates them and rebuilds the index.
+FTS_TRIGGERS = {
+    "scriptures_fts_ai": """
+        CREATE TRIGGER scriptures_fts_ai AFTER INSERT ON scriptures BEGIN
+            INSERT INTO scriptures_fts(rowid, book, text)
+            VALUES (new.id, (SELECT name FROM books WHERE id = new.book_id), new.text);
+        END
+    """,
+    "scriptures_fts_ad": """
+        CREATE TRIGGER scriptures_fts_ad AFTER DELETE ON scriptures BEGIN
+            INSERT INTO scriptures_fts(scriptures_fts, rowid, book, text)
+            VALUES ('delete', old.id, (SELECT name FROM books WHERE id = old.book_id), old.text);
+        END
+    """,
+    "scriptures_fts_au": """
+        CREATE TRIGGER scriptures_fts_au AFTER UPDATE ON scriptures BEGIN
+            INSERT INTO scriptures_fts(scriptures_fts, rowid, book, text)
+            VALUES ('delete', old.id, (SELECT name FROM books WHERE id = old.book_id), old.text);
+            INSERT INTO scriptures_fts(rowid, book, text)
+            VALUES (new.id, (SELECT name FROM books WHERE id = new.book_id), new.text);
+        END
+    """,
+}
 
 class DataEngine:
     """
     Manages the SQLite database for storing and retrieving Bible verses.
     """
-    def __init__(self, db_path):
+    spoken_word_map = _SPOKEN_WORD_MAP
+
+    def __init__(self, db_path, journal_mode='WAL', synchronous='NORMAL',
+                 cache_size=-64000, mmap_size=268435456, max_readers=4):
         """
         Initializes the DataEngine and connects to the database.
 
         :param db_path: Path to the SQLite database file.
+        :param journal_mode: SQLite journal mode. WAL lets readers proceed
+                             without blocking on the journal.
+        :param synchronous: SQLite sync level. Bulk loads can pass 'OFF'.
+        :param cache_size: Page cache size; negative values are in KiB (64 MB by default).
+        :param mmap_size: Bytes of the database file to memory-map (256 MB by default).
+        :param max_readers: Most connections open for lookups at once (see _reader).
         """
         self.db_path = db_path
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.cache_size = int(cache_size)
+        self.mmap_size = int(mmap_size)
+        self.max_readers = max_readers
         self.connection = None
-        self._create_spoken_word_map()
+        self.fts_enabled = False
+        # Lookups borrow a connection from a small pool (see _reader). WAL lets
+        # them read concurrently instead of serializing on one shared handle.
+        self._idle_readers = queue.LifoQueue()
+        self._reader_slots = threading.BoundedSemaphore(max_readers)
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        # Name <-> id maps for the translations and books tables, so the hot
+        # queries stay keyed on integers. Loaded by connect() and setup_database().
+        self._translation_ids = {}
+        self._book_ids = {}
+        self._translation_names = {}
+        self._book_names = {}
+        # Scripture text never changes at runtime, so repeated lookups skip SQLite
+        self._fetch_verse = functools.lru_cache(maxsize=1024)(self._query_verse)
+
+    def _open_connection(self):
+        """Opens and configures a connection, tracked for close_connection()."""
+        # A larger statement cache keeps every lookup query prepared.
+        # Pooled connections are used by whichever thread borrows them.
+        connection = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=256)
+        # These settings are per connection; see __init__ for what each does
+        connection.execute(f"PRAGMA journal_mode={self.journal_mode}")
+        connection.execute(f"PRAGMA synchronous={self.synchronous}")
+        connection.execute("PRAGMA temp_store=MEMORY")
+        connection.execute(f"PRAGMA cache_size={self.cache_size}")
+        connection.execute(f"PRAGMA mmap_size={self.mmap_size}")
+        with self._connections_lock:
+            self._connections.append(connection)
+        return connection
+
+    @contextlib.contextmanager
+    def _reader(self):
+        """
+        Lends a connection for lookups, e.g. from the GUI thread or a ParseTask
+        worker. Thread-local connections would not do: Qt pool threads get a
+        fresh Python thread state per task, so each task would open another.
+        Instead at most max_readers are opened, and borrowers beyond that wait
+        for one to be returned.
+        """
+        # Returned to the queue it came from: close_connection() swaps in a new
+        # one, so a connection closed while lent out is never handed out again
+        idle = self._idle_readers
+        with self._reader_slots:
+            try:
+                connection = idle.get_nowait()
+            except queue.Empty:
+                connection = self._open_connection()
+            try:
+                yield connection
+            finally:
+                idle.put(connection)
 
     def connect(self):
         """Establishes a connection to the SQLite database."""
         try:
-            self.connection = sqlite3.connect(self.db_path)
+            self.connection = self._open_connection()
+            self._load_ids()
             print("Successfully connected to the database.")
         except sqlite3.Error as e:
             print(f"Error connecting to database: {e}")
@@ -35,24 +239,176 @@ class DataEngine:
 
         cursor = self.connection.cursor()
         try:
-            # Table optimized for fast lookups
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS scriptures (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    translation TEXT NOT NULL,
-                    book TEXT NOT NULL,
-                    chapter INTEGER NOT NULL,
-                    verse_num INTEGER NOT NULL,
-                    text TEXT NOT NULL,
-                    UNIQUE(translation, book, chapter, verse_num)
-                );
-            """)
+            self._migrate_text_columns(cursor)
+            self._create_tables(cursor)
+            # Index statistics for the query planner
+            cursor.execute("ANALYZE scriptures")
             self.connection.commit()
             print("Database setup complete. 'scriptures' table is ready.")
         except sqlite3.Error as e:
             print(f"Error setting up database table: {e}")
         finally:
             cursor.close()
+        self._load_ids()
+        self._setup_fts()
+
+    def _create_tables(self, cursor):
+        """
+        Creates the scriptures table and its translations and books dimension
+        tables. Rows store integer ids instead of repeating the names, which
+        keeps rows and index keys small.
+        """
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS translations (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE
+            );
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS books (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE
+            );
+        """)
+        # Table optimized for fast lookups. The UNIQUE constraint indexes
+        # (translation_id, book_id, chapter, verse_num), which covers every
+        # verse/chapter lookup.
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS scriptures (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                translation_id INTEGER NOT NULL REFERENCES translations(id),
+                book_id INTEGER NOT NULL REFERENCES books(id),
+                chapter INTEGER NOT NULL,
+                verse_num INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                UNIQUE(translation_id, book_id, chapter, verse_num)
+            );
+        """)
+
+    def _migrate_text_columns(self, cursor):
+        """
+        Converts a database that stored translation and book names as text on
+        every scriptures row to the integer id layout of _create_tables().
+        Verse ids are kept. The full-text index is dropped and rebuilt by _setup_fts().
+        """
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(scriptures)")}
+        if 'book' not in columns:
+            return
+
+        print("Migrating 'scriptures' to translation and book ids...")
+        # DDL doesn't open a transaction implicitly, so open one explicitly
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            for trigger in FTS_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            cursor.execute("DROP TABLE IF EXISTS scriptures_fts")
+            cursor.execute("ALTER TABLE scriptures RENAME TO scriptures_old")
+            self._create_tables(cursor)
+            cursor.execute("""
+                INSERT INTO translations (name)
+                SELECT DISTINCT translation FROM scriptures_old ORDER BY translation
+            """)
+            cursor.execute("""
+                INSERT INTO books (name)
+                SELECT DISTINCT book FROM scriptures_old ORDER BY book
+            """)
+            cursor.execute("""
+                INSERT INTO scriptures (id, translation_id, book_id, chapter, verse_num, text)
+                SELECT o.id, t.id, b.id, o.chapter, o.verse_num, o.text
+                FROM scriptures_old AS o
+                JOIN translations AS t ON t.name = o.translation
+                JOIN books AS b ON b.name = o.book
+            """)
+            # Also drops the old table's indexes
+            cursor.execute("DROP TABLE scriptures_old")
+            self.connection.commit()
+        except sqlite3.Error:
+            self.connection.rollback()
+            raise
+
+    def _load_ids(self):
+        """Loads the translation and book name <-> id maps from the database."""
+        try:
+            translations = dict(self.connection.execute("SELECT name, id FROM translations"))
+            books = dict(self.connection.execute("SELECT name, id FROM books"))
+        except sqlite3.Error:
+            # Not set up yet; setup_database() loads them once the tables exist
+            return
+        self._translation_ids = translations
+        self._book_ids = books
+        self._translation_names = {id_: name for name, id_ in translations.items()}
+        self._book_names = {id_: name for name, id_ in books.items()}
+
+    def _ids(self, translation, book):
+        """
+        Maps a translation and book name to their ids.
+        :return: A (translation_id, book_id) tuple, or None if either is unknown.
+        """
+        translation_id = self._translation_ids.get(translation)
+        book_id = self._book_ids.get(book)
+        if translation_id is None or book_id is None:
+            return None
+        return translation_id, book_id
+
+    def _setup_fts(self):
+        """
+        Creates the scriptures_fts full-text index and its sync triggers.
+        The index is rebuilt from scriptures whenever a trigger was missing,
+        since rows may have been written without being indexed.
+        """
+        try:
+            # scriptures only holds book ids, so the index reads its content
+            # (including book names) through this view
+            self.connection.execute("""
+                CREATE VIEW IF NOT EXISTS scriptures_search AS
+                SELECT s.id, b.name AS book, s.text
+                FROM scriptures AS s JOIN books AS b ON b.id = s.book_id
+            """)
+            self.connection.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS scriptures_fts USING fts5(
+                    book, text, content='scriptures_search', content_rowid='id',
+                    tokenize='porter unicode61'
+                )
+            """)
+            existing = {row[0] for row in self.connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+            missing = [name for name in FTS_TRIGGERS if name not in existing]
+            if missing:
+                with self.connection:
+                    for name in missing:
+                        self.connection.execute(FTS_TRIGGERS[name])
+                    self.connection.execute("INSERT INTO scriptures_fts(scriptures_fts) VALUES ('rebuild')")
+                print("Full-text search index rebuilt.")
+            self.fts_enabled = True
+        except sqlite3.Error as e:
+            # Some SQLite builds lack FTS5; everything else still works without it
+            print(f"Full-text search unavailable: {e}")
+            self.fts_enabled = False
+
+    def search(self, query, limit=10):
+        """
+        Finds the verses best matching free text, e.g. "the beginning god created".
+
+        :param query: Words to search for. Every word must occur in the verse;
+                      FTS5 operators are not interpreted.
+        :param limit: Maximum number of results.
+        :return: A list of (translation, book, chapter, verse_num) tuples, best match first.
+        """
+        if not self.connection or not self.fts_enabled:
+            return []
+
+        # Quote each word so stray quotes or words like AND/NEAR can't break the query
+        words = re.findall(r"\w+", query)
+        if not words:
+            return []
+        match = ' '.join(f'"{word}"' for word in words)
+
+        try:
+            with self._reader() as connection:
+                return connection.execute(SQL_SEARCH, (match, limit)).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error searching verses: {e}")
+            return []
 
     def get_verse(self, translation, book, chapter, verse_num):
         """
@@ -68,152 +424,146 @@ class DataEngine:
             return None
 
         # Normalize book name using the spoken word map
-        book_key = self.spoken_word_map.get(book.lower(), book)
+        book_key = _SPOKEN_WORD_MAP.get(book.lower(), book)
+        ids = self._ids(translation, book_key)
+        if ids is None:
+            return None
 
-        cursor = self.connection.cursor()
         try:
-            cursor.execute("""
-                SELECT text FROM scriptures
-                WHERE translation = ? AND book = ? AND chapter = ? AND verse_num = ?
-            """, (translation, book_key, chapter, verse_num))
-            result = cursor.fetchone()
-            return result[0] if result else None
+            return self._fetch_verse(*ids, chapter, verse_num)
         except sqlite3.Error as e:
             print(f"Error retrieving verse: {e}")
             return None
-        finally:
-            cursor.close()
+
+    def _query_verse(self, translation_id, book_id, chapter, verse_num):
+        """Runs the verse query; memoized as _fetch_verse. Errors propagate, so they are never cached."""
+        with self._reader() as connection:
+            row = connection.execute(SQL_GET_VERSE, (translation_id, book_id, chapter, verse_num)).fetchone()
+        return row[0] if row else None
+
+    def get_verses_batch(self, translation, book, chapter, verse_nums):
+        """
+        Retrieves several verses of one chapter in a single query, e.g. for
+        a passage like John 3:16-18.
+
+        :param translation: Bible translation (e.g., 'KJV').
+        :param book: The book of the Bible (e.g., 'John').
+        :param chapter: The chapter number.
+        :param verse_nums: An iterable of verse numbers.
+        :return: A dict {verse_num: text} of the verses found, with int keys.
+        """
+        verse_nums = tuple(verse_nums)
+        if not self.connection or not verse_nums:
+            return {}
+
+        # Normalize book name using the spoken word map
+        book_key = _SPOKEN_WORD_MAP.get(book.lower(), book)
+        ids = self._ids(translation, book_key)
+        if ids is None:
+            return {}
+        sql = SQL_GET_VERSES_IN.format(', '.join('?' * len(verse_nums)))
+
+        try:
+            with self._reader() as connection:
+                return dict(connection.execute(sql, ids + (chapter,) + verse_nums))
+        except sqlite3.Error as e:
+            print(f"Error retrieving verses: {e}")
+            return {}
 
     def get_all_book_names(self):
         """Retrieves a sorted list of unique book names from the database."""
         if not self.connection:
             return []
 
-        cursor = self.connection.cursor()
         try:
-            cursor.execute("SELECT DISTINCT book FROM scriptures ORDER BY book")
-            results = cursor.fetchall()
-            return [row[0] for row in results]
+            with self._reader() as connection:
+                return [row[0] for row in connection.execute(SQL_ALL_BOOKS)]
         except sqlite3.Error as e:
             print(f"Error retrieving book names: {e}")
             return []
-        finally:
-            cursor.close()
 
     def get_chapters_for_book(self, translation, book):
         """Retrieves a sorted list of unique chapter numbers for a given book."""
-        if not self.connection:
+        ids = self._ids(translation, book)
+        if not self.connection or ids is None:
             return []
 
-        cursor = self.connection.cursor()
         try:
-            cursor.execute("""
-                SELECT DISTINCT chapter FROM scriptures 
-                WHERE translation = ? AND book = ? ORDER BY chapter
-            """, (translation, book))
-            results = cursor.fetchall()
-            return [str(row[0]) for row in results] # Return as strings for completer
+            with self._reader() as connection:
+                return [row[0] for row in connection.execute(SQL_CHAPTERS_FOR_BOOK, ids)]
         except sqlite3.Error as e:
             print(f"Error retrieving chapter numbers: {e}")
             return []
-        finally:
-            cursor.close()
 
     def get_verses_for_chapter(self, translation, book, chapter):
         """Retrieves a sorted list of unique verse numbers for a given book and chapter."""
-        if not self.connection:
+        ids = self._ids(translation, book)
+        if not self.connection or ids is None:
             return []
 
-        cursor = self.connection.cursor()
         try:
-            cursor.execute("""
-                SELECT DISTINCT verse_num FROM scriptures 
-                WHERE translation = ? AND book = ? AND chapter = ? ORDER BY verse_num
-            """, (translation, book, chapter))
-            results = cursor.fetchall()
-            return [str(row[0]) for row in results] # Return as strings for completer
+            with self._reader() as connection:
+                rows = connection.execute(SQL_VERSES_FOR_CHAPTER, ids + (chapter,))
+                return [row[0] for row in rows]
         except sqlite3.Error as e:
             print(f"Error retrieving verse numbers: {e}")
             return []
-        finally:
-            cursor.close()
 
-    def close_connection(self):
-        """Closes the database connection."""
-        if self.connection:
-            self.connection.close()
-            print("Database connection closed.")
+    def get_all_chapters_by_book(self):
+        """
+        Retrieves every chapter number in the database in one query.
 
-    def _create_spoken_word_map(self):
+        :return: A dict {(translation, book): [chapter, ...]} with chapters as
+                 sorted ints, matching get_chapters_for_book().
         """
-        Creates an internal dictionary to map spoken variations of book names.
-        This is a foundational implementation. A more robust solution might
-        use fuzzy matching or a more extensive list.
+        if not self.connection:
+            return {}
+
+        try:
+            translations, books = self._translation_names, self._book_names
+            chapters = {}
+            with self._reader() as connection:
+                for translation_id, book_id, chapter in connection.execute(SQL_ALL_CHAPTERS):
+                    key = (translations[translation_id], books[book_id])
+                    chapters.setdefault(key, []).append(chapter)
+            return chapters
+        except sqlite3.Error as e:
+            print(f"Error retrieving all chapter numbers: {e}")
+            return {}
+
+    def get_all_verses_by_chapter(self):
+        """
+        Retrieves every verse number in the database in one query.
+
+        :return: A dict {(translation, book, chapter): [verse_num, ...]} with the
+                 chapter and verse numbers as ints, matching get_verses_for_chapter().
         """
-        self.spoken_word_map = {
-            "first corinthians": "1 Corinthians",
-            "second corinthians": "2 Corinthians",
-            "one corinthians": "1 Corinthians",
-            "two corinthians": "2 Corinthians",
-            "genesis": "Genesis",
-            "exodus": "Exodus",
-            "leviticus": "Leviticus",
-            "numbers": "Numbers",
-            "deuteronomy": "Deuteronomy",
-            "joshua": "Joshua",
-            "judges": "Judges",
-            "ruth": "Ruth",
-            "first samuel": "1 Samuel",
-            "second samuel": "2 Samuel",
-            "first kings": "1 Kings",
-            "second kings": "2 Kings",
-            "first chronicles": "1 Chronicles",
-            "second chronicles": "2 Chronicles",
-            "ezra": "Ezra",
-            "nehemiah": "Nehemiah",
-            "esther": "Esther",
-            "job": "Job",
-            "psalms": "Psalm",
-            "proverbs": "Proverbs",
-            "ecclesiastes": "Ecclesiastes",
-            "song of solomon": "Song of Solomon",
-            "isaiah": "Isaiah",
-            "jeremiah": "Jeremiah",
-            "lamentations": "Lamentations",
-            "ezekiel": "Ezekiel",
-            "daniel": "Daniel",
-            "hosea": "Hosea",
-            "joel": "Joel",
-            "amos": "Amos",
-            "obadiah": "Obadiah",
-            "jonah": "Jonah",
-            "micah": "Micah",
-            "nahum": "Nahum",
-            "habakkuk": "Habakkuk",
-            "zephaniah": "Zephaniah",
-            "haggai": "Haggai",
-            "zechariah": "Zechariah",
-            "malachi": "Malachi",
-            "matthew": "Matthew",
-            "mark": "Mark",
-            "luke": "Luke",
-            "john": "John",
-            "acts": "Acts",
-            "romans": "Romans",
-            "first timothy": "1 Timothy",
-            "second timothy": "2 Timothy",
-            "titus": "Titus",
-            "philemon": "Philemon",
-            "hebrews": "Hebrews",
-            "james": "James",
-            "first peter": "1 Peter",
-            "second peter": "2 Peter",
-            "first john": "1 John",
-            "second john": "2 John",
-            "third john": "3 John",
-            "jude": "Jude",
-            "revelation": "Revelation"
-        }
+        if not self.connection:
+            return {}
+
+        try:
+            translations, books = self._translation_names, self._book_names
+            verses = {}
+            with self._reader() as connection:
+                for translation_id, book_id, chapter, verse_num in connection.execute(SQL_ALL_VERSES):
+                    key = (translations[translation_id], books[book_id], chapter)
+                    verses.setdefault(key, []).append(verse_num)
+            return verses
+        except sqlite3.Error as e:
+            print(f"Error retrieving all verse numbers: {e}")
+            return {}
+
+    def close_connection(self):
+        """Closes the main and all pooled database connections and drops cached lookups."""
+        self._fetch_verse.cache_clear()
+        self.connection = None
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        self._idle_readers = queue.LifoQueue()
+        for connection in connections:
+            connection.close()
+        if connections:
+            print("Database connection closed.")
 
 if __name__ == '__main__':
     # Example Usage:
@@ -242,11 +592,15 @@ if __name__ == '__main__':
         # 2. Test inserting and retrieving a verse
         cursor = engine.connection.cursor()
         try:
+            cursor.execute("INSERT OR IGNORE INTO translations (name) VALUES ('KJV')")
+            cursor.execute("INSERT OR IGNORE INTO books (name) VALUES ('Genesis')")
             cursor.execute("""
-                INSERT INTO scriptures (translation, book, chapter, verse_num, text)
-                VALUES ('KJV', 'Genesis', 1, 1, 'In the beginning God created the heaven and the earth.')
+                INSERT INTO scriptures (translation_id, book_id, chapter, verse_num, text)
+                SELECT t.id, b.id, 1, 1, 'In the beginning God created the heaven and the earth.'
+                FROM translations AS t, books AS b WHERE t.name = 'KJV' AND b.name = 'Genesis'
             """)
             engine.connection.commit()
+            engine.setup_database()  # Reload the name <-> id maps
             print("Test data inserted.")
 
             verse = engine.get_verse('KJV', 'genesis', 1, 1) # Test with lowercase book
@@ -259,18 +613,33 @@ if __name__ == '__main__':
             print(f"Test passed: get_all_book_names() -> {books}")
 
             chapters = engine.get_chapters_for_book('KJV', 'Genesis')
-            assert "1" in chapters
+            assert 1 in chapters
             print(f"Test passed: get_chapters_for_book() -> {chapters}")
 
             verses = engine.get_verses_for_chapter('KJV', 'Genesis', 1)
-            assert "1" in verses
+            assert 1 in verses
             print(f"Test passed: get_verses_for_chapter() -> {verses}")
 
+            # 4. Test that lookups from many short-lived threads (like ParseTask
+            # workers) share the pool instead of each opening a connection
+            results = []
+            threads = [
+                threading.Thread(target=lambda: results.append(engine.get_verses_for_chapter('KJV', 'Genesis', 1)))
+                for _ in range(30)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert results == [[1]] * 30
+            assert len(engine._connections) <= 1 + engine.max_readers
+            print(f"Test passed: 30 threads used {len(engine._connections)} connections.")
+
         except sqlite3.Error as e:
             print(f"An error occurred during tests: {e}")
         finally:
             # Clean up the test entry
-            cursor.execute("DELETE FROM scriptures WHERE book = 'Genesis'")
+            cursor.execute("DELETE FROM scriptures WHERE book_id = (SELECT id FROM books WHERE name = 'Genesis')")
             engine.connection.commit()
             cursor.close()
             print("Test data cleaned up.")
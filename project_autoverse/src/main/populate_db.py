@@ -1,7 +1,7 @@
 
 import csv
 import os
-from data_engine import DataEngine
+from data_engine import DataEngine, FTS_TRIGGERS
 
 def populate_from_csv(db_engine, csv_path, translation_name):
     """
@@ -18,38 +18,72 @@ def populate_from_csv(db_engine, csv_path, translation_name):
 
     print(f"Populating database with {translation_name} translation from {csv_path}...")
 
+    connection = db_engine.connection
+    cursor = None
     try:
         with open(csv_path, 'r', encoding='utf-8') as f:
             reader = csv.reader(f)
             # Skipping header row if it exists. Adjust if your CSV doesn't have a header.
             next(reader, None)  
 
-            cursor = db_engine.connection.cursor()
-            verses_to_insert = []
-            for row in reader:
-                                try:
-                                    # Corrected indices: Book Name=1, Chapter=3, Verse=4, Text=5
-                                    book_name = row[1]
-                                    chapter = int(row[3])
-                                    verse_num = int(row[4])
-                                    text = row[5]
-                                    verses_to_insert.append((translation_name, book_name, chapter, verse_num, text))
-                                except (IndexError, ValueError) as e:                    print(f"Skipping malformed row: {row} - Error: {e}")
-
-            # Use executemany for efficient bulk insertion
+            # Name -> id for the translations and books dimension tables. A book
+            # is looked up in SQLite only the first time it appears in the CSV.
+            book_ids = {}
+
+            def dimension_id(table, name):
+                """Returns the id of name in table, inserting it if it's new."""
+                connection.execute(f"INSERT OR IGNORE INTO {table} (name) VALUES (?)", (name,))
+                return connection.execute(f"SELECT id FROM {table} WHERE name = ?", (name,)).fetchone()[0]
+
+            def rows():
+                """Parses CSV rows lazily, so no list of every verse is built."""
+                for row in reader:
+                    try:
+                        # Corrected indices: Book Name=1, Chapter=3, Verse=4, Text=5
+                        book, chapter, verse_num, text = row[1], int(row[3]), int(row[4]), row[5]
+                    except (IndexError, ValueError) as e:
+                        print(f"Skipping malformed row: {row} - Error: {e}")
+                        continue
+                    book_id = book_ids.get(book)
+                    if book_id is None:
+                        book_id = book_ids[book] = dimension_id('books', book)
+                    yield (translation_id, book_id, chapter, verse_num, text)
+
+            # Bulk-load settings: no fsync, journal and page cache kept in memory
+            connection.execute("PRAGMA synchronous=OFF")
+            connection.execute("PRAGMA journal_mode=MEMORY")
+            connection.execute("PRAGMA cache_size=-262144")
+            # Updating the full-text index row by row dominates the load;
+            # setup_database() rebuilds it once afterwards
+            for trigger in FTS_TRIGGERS:
+                connection.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+
+            # Use executemany for efficient bulk insertion, in a single transaction.
+            # It pulls rows from the generator one at a time.
+            cursor = connection.cursor()
+            connection.execute("BEGIN IMMEDIATE")
+            translation_id = dimension_id('translations', translation_name)
             cursor.executemany("""
-                INSERT INTO scriptures (translation, book, chapter, verse_num, text)
+                INSERT INTO scriptures (translation_id, book_id, chapter, verse_num, text)
                 VALUES (?, ?, ?, ?, ?)
-            """, verses_to_insert)
+            """, rows())
 
-            db_engine.connection.commit()
-            print(f"Successfully inserted {len(verses_to_insert)} verses.")
+            connection.commit()
+            print(f"Successfully inserted {cursor.rowcount} verses.")
 
     except Exception as e:
+        if connection.in_transaction:
+            connection.rollback()
         print(f"An error occurred during database population: {e}")
     finally:
         if cursor:
             cursor.close()
+        # Restore the engine's normal settings, then rebuild the full-text index,
+        # refresh the planner statistics and reload the name <-> id maps
+        connection.execute(f"PRAGMA journal_mode={db_engine.journal_mode}")
+        connection.execute(f"PRAGMA synchronous={db_engine.synchronous}")
+        connection.execute(f"PRAGMA cache_size={db_engine.cache_size}")
+        db_engine.setup_database()
 
 if __name__ == '__main__':
     # --- Configuration ---
@@ -57,8 +91,9 @@ if __name__ == '__main__':
     KJV_CSV_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 't_kjv.csv')
     
     # --- Execution ---
-    # Initialize the data engine
-    engine = DataEngine(DB_FILE)
+    # Initialize the data engine. Skipping fsync is safe for a one-off load that
+    # can simply be re-run, and the setting only lasts for this connection.
+    engine = DataEngine(DB_FILE, synchronous='OFF')
     engine.connect()
     # Ensure the table is created
     engine.setup_database() 
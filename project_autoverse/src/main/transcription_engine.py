@@ -1,12 +1,51 @@
 
 import vosk
 import sounddevice as sd
-import queue
+import collections
+import threading
 import json
 import os
-from pydub import AudioSegment
+import re
+import wave
+import subprocess
 import numpy as np
 
+# Native sample rate of the Vosk models used here. Capturing at this rate
+# spares Vosk resampling every block.
+MODEL_SAMPLERATE = 16000
+
+# Seconds of audio per callback block. 100 ms keeps partial results and the
+# queue short; Vosk handles small chunks without loss of accuracy.
+BLOCK_DURATION = 0.1
+# Most seconds of queued audio passed to Vosk in one AcceptWaveform call when
+# the transcription loop falls behind
+MAX_BATCH_DURATION = 0.2
+# RMS level (of 32768) below which a block counts as silence, about -44 dBFS
+SILENCE_RMS = 200
+
+# Real-time priority requested for the audio callback thread on Linux
+AUDIO_THREAD_PRIORITY = 50
+
+# Vosk results are flat JSON objects; the one field we need is pulled out with
+# a regex, which is much cheaper than json.loads on every audio block
+_PARTIAL_RE = re.compile(r'"partial"\s*:\s*"(.*?)"', re.S)
+_TEXT_RE = re.compile(r'"text"\s*:\s*"(.*?)"', re.S)
+
+def _is_silent(data):
+    """Returns True if a block of 16-bit PCM bytes is quieter than SILENCE_RMS."""
+    samples = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+    return np.dot(samples, samples) < SILENCE_RMS * SILENCE_RMS * len(samples)
+
+def _extract_result_field(payload, pattern, key):
+    """
+    Returns the string field `key` from a Vosk result JSON string.
+    Falls back to json.loads when the value holds escapes the regex can't decode.
+    """
+    match = pattern.search(payload)
+    if match and '\\' not in match.group(1):
+        return match.group(1)
+    return json.loads(payload).get(key, '')
+
 # --- 1. The Vocabulary Generator Class ---
 
 class VoskGrammarGenerator:
@@ -34,11 +73,13 @@ class VoskGrammarGenerator:
         "third john", "jude", "revelation"
     ]
 
-    # Numbers for Chapters/Verses (0 to 100 for redundancy)
-    NUMBERS = [str(i) for i in range(101)] + [
+    # Numbers for Chapters/Verses, spelled out as Vosk models emit them
+    # (digit strings are out of vocabulary, so Vosk would only drop them)
+    NUMBERS = [
         "zero", "one", "two", "three", "four", "five", "six", "seven", "eight",
         "nine", "ten", "eleven", "twelve", "thirteen", "fourteen", "fifteen",
-        "twenty", "thirty", "forty", "fifty", "hundred",
+        "sixteen", "seventeen", "eighteen", "nineteen", "twenty", "thirty",
+        "forty", "fifty", "sixty", "seventy", "eighty", "ninety", "hundred",
         # Ordinals for 1/2/3 John/Peter/Corinthians
         "first", "second", "third"
     ]
@@ -51,22 +92,26 @@ class VoskGrammarGenerator:
     ]
 
     @classmethod
-    def generate_grammar_list(cls):
-        """Generates a complete list of all words for the Vosk grammar."""
-        # Combine all lists, convert to lowercase, and ensure unique words
+    def build_vocabulary(cls):
+        """Builds the set of unique grammar words from the lists above."""
+        # Combine all lists and ensure unique words (they're already lowercase)
         full_vocabulary = set()
 
         # Add book names and their components (e.g., 'first' and 'corinthians' separately)
         for book in cls.BIBLE_BOOKS:
-            for word in book.split():
-                full_vocabulary.add(word)
+            full_vocabulary.update(book.split())
 
         # Add numbers and keywords
         full_vocabulary.update(cls.NUMBERS)
         full_vocabulary.update(cls.KEYWORDS)
+        return frozenset(full_vocabulary)
 
-        # Vosk expects the grammar to be a list of words, plus the out-of-vocabulary token [unk]
-        return list(full_vocabulary)
+    @classmethod
+    def generate_grammar_list(cls):
+        """Generates a complete list of all words for the Vosk grammar."""
+        # Vosk expects the grammar to be a list of words, plus the out-of-vocabulary token [unk].
+        # Sorted so the cached JSON is identical from run to run.
+        return sorted(cls.VOCABULARY) + ["[unk]"]
 
     @classmethod
     def generate_vosk_json(cls):
@@ -77,6 +122,68 @@ class VoskGrammarGenerator:
         # For simple vocabulary biasing, we can simply stringify the list
         return json.dumps(grammar_list)
 
+# The vocabulary is static, so it and the grammar JSON are built once at import
+# instead of on every start_listening call. VOCABULARY also gives O(1)
+# membership tests for grammar words.
+VoskGrammarGenerator.VOCABULARY = VoskGrammarGenerator.build_vocabulary()
+VoskGrammarGenerator.GRAMMAR_JSON = VoskGrammarGenerator.generate_vosk_json()
+
+class RecordingWriter:
+    """
+    Encodes 16-bit mono PCM to a file while it is being captured, so a
+    recording is never held in memory. Paths ending in '.wav' are written
+    directly; anything else is piped to ffmpeg and encoded as MP3.
+    """
+    def __init__(self, output_path, samplerate):
+        """
+        :param output_path: The path of the file to create.
+        :param samplerate: The sample rate of the PCM that will be written.
+        """
+        self.output_path = output_path
+        self._wav = None
+        self._ffmpeg = None
+
+        # Ensure the output directory exists
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+        if output_path.lower().endswith('.wav'):
+            # WAV is a header plus the raw samples, so no encoder is needed
+            self._wav = wave.open(output_path, 'wb')
+            self._wav.setnchannels(1)
+            self._wav.setsampwidth(2)
+            self._wav.setframerate(samplerate)
+        else:
+            # Compression level 9 is LAME's fastest algorithm; the bitrate is unchanged
+            self._ffmpeg = subprocess.Popen(
+                ['ffmpeg', '-y', '-loglevel', 'error',
+                 '-f', 's16le', '-ar', str(samplerate), '-ac', '1', '-i', 'pipe:0',
+                 '-codec:a', 'libmp3lame', '-compression_level', '9', output_path],
+                stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+
+    def write(self, data):
+        """Appends a block of PCM bytes to the recording."""
+        if self._wav:
+            # The header's length fields are patched once, on close
+            self._wav.writeframesraw(data)
+        else:
+            self._ffmpeg.stdin.write(data)
+
+    def close(self):
+        """
+        Finishes the file.
+        :return: True if the file was written successfully.
+        """
+        if self._wav:
+            self._wav.close()
+            return True
+        try:
+            self._ffmpeg.stdin.close()
+        finally:
+            # Reaped even if ffmpeg already exited and closing the pipe failed
+            returncode = self._ffmpeg.wait()
+        return returncode == 0
+
 class TranscriptionEngine:
     """
     Handles live audio transcription using the Vosk STT library.
@@ -90,11 +197,23 @@ class TranscriptionEngine:
         self.model_path = model_path
         self.model = None
         self.recognizer = None
+        # Recognizers by (samplerate, grammar JSON), reused across sessions
+        self._recognizers = {}
         self.is_listening = False
-        self.audio_queue = queue.Queue()
+        # Single producer (audio callback), single consumer (transcription loop):
+        # deque append/popleft are atomic, and the event only signals new data
+        self.audio_deque = collections.deque()
+        self.audio_event = threading.Event()
         self.model_loaded = False
         self.is_recording = False
-        self.recorded_frames = []
+        # Only the transcription thread writes to and closes the recorder
+        self._recorder = None
+        self._audio_thread_prioritized = False
+        # PortAudio device enumeration can take 100s of ms on some backends,
+        # so it is done once here and again only on refresh_devices()
+        self._devices = ()
+        self._hostapis = ()
+        self._query_devices()
         self._load_model()
 
     def _load_model(self):
@@ -111,15 +230,39 @@ class TranscriptionEngine:
             print(f"Error loading Vosk model: {e}")
             self.model_loaded = False
 
-    @staticmethod
-    def list_audio_devices():
+    def refresh_devices(self):
+        """
+        Re-reads the audio devices, e.g. after a device was plugged in.
+        PortAudio only sees new devices after it is re-initialized, which
+        would break an open stream, so that is skipped while listening.
+        """
+        if not self.is_listening:
+            try:
+                sd._terminate()
+                sd._initialize()
+            except Exception as e:
+                print(f"Could not re-initialize PortAudio: {e}")
+        self._query_devices()
+
+    def _query_devices(self):
+        """Caches the device and host API lists for list_audio_devices()."""
+        try:
+            self._devices = sd.query_devices()
+            self._hostapis = sd.query_hostapis()
+        except Exception as e:
+            print(f"Could not retrieve audio devices: {e}")
+            self._devices = ()
+            self._hostapis = ()
+
+    def list_audio_devices(self):
         """
         Lists available audio input devices and identifies the default input device.
+        Uses the devices cached by refresh_devices().
         :return: A tuple containing (dictionary of input devices {index: name}, default_device_index).
         """
         try:
-            devices = sd.query_devices()
-            hostapis = sd.query_hostapis()
+            devices = self._devices
+            hostapis = self._hostapis
 
             default_api = next((api for api in hostapis if api['name'] == sd.default.hostapi), None)
             default_device_index = -1
@@ -135,23 +278,58 @@ class TranscriptionEngine:
             return {}, -1
 
     def _audio_callback(self, indata, frames, time, status):
-        """This is called (from a separate thread) for each audio block."""
+        """
+        This is called (from a separate thread) for each audio block. indata is
+        the raw CFFI buffer, so the single bytes() copy is all the work done here;
+        recording and recognition happen on the transcription thread.
+        """
         if status:
             self.status_callback(f"Audio callback status: {status}")
+        if not self._audio_thread_prioritized:
+            self._prioritize_audio_thread()
 
-        # The data from sounddevice is a numpy array, which is what we need for wav saving
-        if self.is_recording:
-            self.recorded_frames.append(indata.copy())
+        self.audio_deque.append(bytes(indata))
+        self.audio_event.set()
 
-        self.audio_queue.put(bytes(indata))
+    def _prioritize_audio_thread(self):
+        """
+        Moves the calling (PortAudio callback) thread to real-time scheduling
+        on Linux, so load on other threads can't delay audio blocks. Needs
+        CAP_SYS_NICE or an rtprio limit; without them capture runs as before.
+        """
+        self._audio_thread_prioritized = True  # Only try once per stream
+        if not hasattr(os, 'sched_setscheduler'):
+            return
+        try:
+            # pid 0 is the calling thread on Linux
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(AUDIO_THREAD_PRIORITY))
+        except OSError:
+            pass
+
+    @staticmethod
+    def _capture_samplerate(device_index, device_info):
+        """
+        Picks the capture rate: the model's native rate if the device (or its
+        host API) can deliver it, otherwise the device default, which Vosk
+        then resamples internally.
+        """
+        try:
+            sd.check_input_settings(device=device_index, samplerate=MODEL_SAMPLERATE, channels=1, dtype='int16')
+            return MODEL_SAMPLERATE
+        except (sd.PortAudioError, ValueError):
+            return int(device_info['default_samplerate'])
 
-    def start_listening(self, on_transcription_update, on_status_update, device_index=None, record_audio=False):
+    def start_listening(self, on_transcription_update, on_status_update, device_index=None, record_path=None, grammar_json=None):
         """
         Starts the audio stream and transcription process.
 
         :param on_transcription_update: A callback for transcription results.
         :param on_status_update: A callback for status messages.
         :param device_index: The index of the audio device to use.
+        :param record_path: Optional path to record the session to, encoded as
+                            it is captured (see RecordingWriter).
+        :param grammar_json: Optional Vosk grammar (a JSON list of words), used
+                             as-is. Defaults to VoskGrammarGenerator.GRAMMAR_JSON.
         """
         self.status_callback = on_status_update
         if not self.model_loaded:
@@ -163,36 +341,102 @@ class TranscriptionEngine:
             return
 
         try:
-            device_info = sd.query_devices(device_index, 'input')
-            self.samplerate = int(device_info['default_samplerate'])
-
-            # Start recording if requested
-            self.is_recording = record_audio
-            if self.is_recording:
-                self.recorded_frames = [] # Clear previous recording
-                self.status_callback("Recording audio...")
-
-            self.stream = sd.InputStream(
-                samplerate=self.samplerate, blocksize=8000, device=device_index,
-                dtype='int16', channels=1, callback=self._audio_callback
+            if device_index is not None and device_index < len(self._devices):
+                device_info = self._devices[device_index]
+            else:
+                device_info = sd.query_devices(device_index, 'input')
+            self.samplerate = self._capture_samplerate(device_index, device_info)
+
+            # Vosk only needs bytes, so skip the per-block ndarray wrapper
+            self.stream = sd.RawInputStream(
+                samplerate=self.samplerate, blocksize=int(self.samplerate * BLOCK_DURATION),
+                device=device_index, dtype='int16', channels=1, latency='low',
+                callback=self._audio_callback
             )
 
-            # Generate and apply the custom grammar
-            grammar = VoskGrammarGenerator.generate_vosk_json()
-            self.recognizer = vosk.KaldiRecognizer(self.model, self.samplerate, grammar)
+            # Apply the custom grammar
+            if not grammar_json:
+                grammar_json = VoskGrammarGenerator.GRAMMAR_JSON
+            # Building a recognizer compiles the grammar, so each one is kept
+            # and reused for later sessions with the same rate and grammar
+            key = (self.samplerate, grammar_json)
+            recognizer = self._recognizers.get(key)
+            if recognizer is None:
+                recognizer = self._recognizers[key] = vosk.KaldiRecognizer(self.model, self.samplerate, grammar_json)
+            else:
+                # Drop any audio and partial result left from the previous session
+                recognizer.Reset()
+            self.recognizer = recognizer
+
+            # Drop blocks left over from the previous session
+            self.audio_deque.clear()
+            self.audio_event.clear()
+            self._audio_thread_prioritized = False
+
+            # Start recording if requested
+            if record_path:
+                try:
+                    self._recorder = RecordingWriter(record_path, self.samplerate)
+                    self.is_recording = True
+                    self.status_callback("Recording audio...")
+                except OSError as e:
+                    # e.g. ffmpeg not installed; transcription still works
+                    self.status_callback(f"Recording unavailable: {e}")
 
             self.is_listening = True
             self.stream.start()
             self.status_callback(f"Listening on: {device_info['name']}")
 
+            # 16-bit mono, so two bytes per frame
+            max_batch_bytes = int(self.samplerate * MAX_BATCH_DURATION) * 2
+            # Vosk repeats the same partial for every block until the words change
+            last_partial = ''
+            # True between utterances. Silence is only skipped then: within an
+            # utterance Vosk needs the trailing silence to end it with a final result.
+            idle = True
+            # The last block skipped as silence. Speech starting late in a block
+            # can leave it under the threshold, so it is fed to Vosk ahead of
+            # the first audible block to keep the utterance's first phoneme.
+            preroll = b''
             while self.is_listening:
-                data = self.audio_queue.get()
-                if self.recognizer.AcceptWaveform(data):
-                    result = json.loads(self.recognizer.Result())
-                    on_transcription_update(result.get('text', ''), is_final=True)
-                else:
-                    partial_result = json.loads(self.recognizer.PartialResult())
-                    on_transcription_update(partial_result.get('partial', ''), is_final=False)
+                self.audio_event.wait()
+                # Clear before draining so a block appended meanwhile re-sets it
+                self.audio_event.clear()
+                while self.is_listening and self.audio_deque:
+                    data = self.audio_deque.popleft()
+                    if self.audio_deque:
+                        # Behind: decode the backlog in fewer calls. When keeping
+                        # up, blocks go through one by one without added latency.
+                        blocks = [data]
+                        size = len(data)
+                        while self.audio_deque and size < max_batch_bytes:
+                            blocks.append(self.audio_deque.popleft())
+                            size += len(blocks[-1])
+                        data = b''.join(blocks)
+                    if self._recorder:
+                        try:
+                            self._recorder.write(data)
+                        except OSError as e:
+                            # e.g. ffmpeg exited or the disk is full
+                            self._abort_recording(e)
+                    if idle:
+                        if _is_silent(data):
+                            preroll = data
+                            continue
+                        data = preroll + data
+                        preroll = b''
+                    idle = False
+                    if self.recognizer.AcceptWaveform(data):
+                        text = _extract_result_field(self.recognizer.Result(), _TEXT_RE, 'text')
+                        on_transcription_update(text, is_final=True)
+                        last_partial = ''
+                        idle = True
+                    else:
+                        partial = _extract_result_field(self.recognizer.PartialResult(), _PARTIAL_RE, 'partial')
+                        # Vosk emits an empty partial for every block of silence
+                        if partial and partial != last_partial:
+                            last_partial = partial
+                            on_transcription_update(partial, is_final=False)
 
         except Exception as e:
             error_message = f"ERROR: Failed to start listening. Check audio device. Details: {e}"
@@ -201,50 +445,49 @@ class TranscriptionEngine:
             if hasattr(self, 'stream') and self.stream:
                 self.stream.stop()
                 self.stream.close()
+        finally:
+            self._finish_recording()
+
+    def _abort_recording(self, error):
+        """Drops a recording that can no longer be written; transcription carries on."""
+        recorder, self._recorder = self._recorder, None
+        self.is_recording = False
+        self.status_callback(f"Recording stopped: {error}")
+        try:
+            recorder.close()
+        except OSError:
+            pass
+
+    def _finish_recording(self):
+        """Writes any blocks still queued to the recording and closes it."""
+        if not self._recorder:
+            return
+        recorder, self._recorder = self._recorder, None
+        self.is_recording = False
+        try:
+            while self.audio_deque:
+                recorder.write(self.audio_deque.popleft())
+            if recorder.close():
+                self.status_callback(f"Audio saved to {recorder.output_path}")
+            else:
+                self.status_callback(f"Error saving audio to {recorder.output_path}")
+        except OSError as e:
+            self.status_callback(f"Error saving audio: {e}")
 
     def stop_listening(self):
         """
-        Stops the audio stream and transcription process.
+        Stops the audio stream and transcription process. A recording is
+        finished on the transcription thread as its loop exits.
         """
         if not self.is_listening:
             self.status_callback("Not currently listening.")
             return
 
         self.is_listening = False
+        # Wake the transcription loop so it sees the flag and exits
+        self.audio_event.set()
         if hasattr(self, 'stream') and self.stream:
             self.stream.stop()
             self.stream.close()
 
-        self.is_recording = False
         self.status_callback("Stopped listening.")
-
-    def save_audio_stream(self, output_path):
-        """
-        Saves the captured audio stream to a MP3 file.
-        :param output_path: The path to save the MP3 file.
-        """
-        if not self.recorded_frames:
-            self.status_callback("No audio recorded to save.")
-            return
-
-        try:
-            # Ensure the output directory exists
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-
-            # Combine the recorded frames into a single numpy array
-            audio_data = np.concatenate(self.recorded_frames, axis=0)
-
-            # Create an AudioSegment from the raw audio data
-            audio_segment = AudioSegment(
-                audio_data.tobytes(),
-                frame_rate=self.samplerate,
-                sample_width=audio_data.dtype.itemsize,
-                channels=1
-            )
-
-            # Export the audio to MP3 format
-            audio_segment.export(output_path, format="mp3")
-
-            self.status_callback(f"Audio saved to {output_path}")
-        except Exception as e:
-            self.status_callback(f"Error saving audio: {e}")